@@ -0,0 +1,261 @@
+"""
+PDF text extraction and cleanup for the audiobook converter.
+Extracts page text, detects chapters and prepares text for speech.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pdfplumber
+import pypdfium2 as pdfium
+
+# Minimum pages per worker process before PDF text extraction is split
+# across processes (smaller PDFs aren't worth the process startup cost)
+EXTRACT_MIN_PAGES_PER_WORKER = 16
+
+# Common chapter patterns (matched within a single line, so whitespace
+# excludes newlines)
+CHAPTER_PATTERNS = (
+    r'Chapter[^\S\n]+\d+(?::|[^\S\n]).{0,100}',
+    r'CHAPTER[^\S\n]+\d+(?::|[^\S\n]).{0,100}',
+    r'Part[^\S\n]+\d+(?::|[^\S\n]).{0,100}',
+    r'PART[^\S\n]+\d+(?::|[^\S\n]).{0,100}',
+    r'Section[^\S\n]+\d+(?::|[^\S\n]).{0,100}',
+    r'\d+\.[^\S\n]+[A-Z].{0,100}',
+)
+# All patterns in one alternation, scanned over the full text in one pass.
+# Surrounding whitespace on the line is ignored, as if it had been stripped.
+COMBINED_CHAPTER_RE = re.compile(
+    r'^[^\S\n]*(?:' + '|'.join(f'(?:{p})' for p in CHAPTER_PATTERNS) + r')(?<=\S)[^\S\n]*$',
+    re.IGNORECASE | re.MULTILINE
+)
+# Table of contents entries (headings ending with page numbers)
+TOC_RE = re.compile(r'^\s*(chapter|part|section)\s+\d+.*\d+\s*$', re.IGNORECASE)
+
+# Text cleanup patterns
+_PAGENUM = re.compile(r'\n\s*\d+\s*\n')
+_WS_NL = re.compile(r'\n{3,}')
+_WS_SP = re.compile(r' {2,}')
+_DOTS = re.compile(r'\.{3,}')
+_LINEBRK = re.compile(r'([a-z])\n([A-Z])')
+
+# Results kept across conversions, so retrying the same PDF with another
+# voice skips parsing and cleaning. Least recently used entries are evicted
+# first.
+_PDF_TEXT_CACHE = {}
+_PDF_TEXT_CACHE_SIZE = 8
+_CLEAN_TEXT_CACHE = {}
+_CLEAN_TEXT_CACHE_SIZE = 128
+_CACHE_LOCK = threading.Lock()
+
+
+def _cache_get(cache: dict, key):
+    """Look up a cached value, marking it as most recently used on a hit."""
+    with _CACHE_LOCK:
+        if key not in cache:
+            return None
+        # Re-insert so the entry moves to the end of the eviction order
+        value = cache[key] = cache.pop(key)
+        return value
+
+
+def _cache_put(cache: dict, key, value, max_size: int) -> None:
+    """Store a value in a bounded cache, evicting the least recently used entry if full."""
+    with _CACHE_LOCK:
+        if key in cache:
+            del cache[key]
+        elif len(cache) >= max_size:
+            del cache[next(iter(cache))]
+        cache[key] = value
+
+
+def _extract_pages_text(pages) -> list[str]:
+    """
+    Extract text from pdfplumber pages, dropping each page's parsed objects
+    and character text map once its text has been read.
+    """
+    pages_text = []
+    for page in pages:
+        pages_text.append(page.extract_text() or "")
+        # pdf.pages keeps every page alive until the document is closed, so
+        # clear both the layout/object cache and extract_text's text map
+        page.flush_cache()
+        page.get_textmap.cache_clear()
+    return pages_text
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> list[str]:
+    """Extract text from pages [start, stop) of a PDF. Runs in a worker process."""
+    with pdfplumber.open(pdf_path) as pdf:
+        return _extract_pages_text(pdf.pages[start:stop])
+
+
+def _extract_pages_fast(pdf_path: str) -> list[str]:
+    """Extract the text of every page with pdfium (fast, no layout analysis)."""
+    pages_text = []
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        for page in pdf:
+            textpage = page.get_textpage()
+            text = textpage.get_text_range()
+            textpage.close()
+            page.close()
+            # pdfium separates lines with CRLF
+            pages_text.append(text.replace("\r\n", "\n").replace("\r", "\n"))
+    finally:
+        pdf.close()
+    return pages_text
+
+
+def _extract_pages_pdfplumber(pdf_path: str) -> list[str]:
+    """Extract the text of every page with pdfplumber (slower, layout aware)."""
+    # Count pages with pdfium, which doesn't parse page content, so the PDF
+    # is only opened with pdfplumber where its text is actually extracted
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        total_pages = len(pdf)
+    finally:
+        pdf.close()
+
+    workers = min(os.cpu_count() or 1, total_pages // EXTRACT_MIN_PAGES_PER_WORKER)
+
+    if workers < 2:
+        with pdfplumber.open(pdf_path) as pdf:
+            return _extract_pages_text(pdf.pages)
+
+    # pdfminer's layout analysis is pure Python and CPU bound, so large PDFs
+    # are split into one contiguous page range per worker process
+    batch_size = -(-total_pages // workers)
+    starts = range(0, total_pages, batch_size)
+    stops = [min(start + batch_size, total_pages) for start in starts]
+
+    pages_text = []
+    # Always spawn workers: forking the running Gradio server while its
+    # threads (and the TTS pool) are alive can deadlock the child. Spawned
+    # workers re-import the main module, so they pay its import cost (gradio
+    # included) once each; the UI itself is only built under __main__.
+    mp_context = multiprocessing.get_context("spawn")
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as executor:
+        for batch in executor.map(_extract_page_range, [pdf_path] * len(starts), starts, stops):
+            pages_text.extend(batch)
+
+    return pages_text
+
+
+def extract_pages(pdf_path: str, use_pdfplumber: bool = False) -> list[str]:
+    """
+    Extract the text of every page of a PDF.
+    pdfium is used by default; pdfplumber can be opted into for table-heavy PDFs.
+    """
+    if use_pdfplumber:
+        return _extract_pages_pdfplumber(pdf_path)
+    return _extract_pages_fast(pdf_path)
+
+
+def extract_text_from_pdf(pdf_path: str, use_pdfplumber: bool = False) -> tuple[str, list[tuple[str, str]]]:
+    """
+    Extract text from PDF and attempt to detect chapters.
+    Results are cached until the file changes.
+    Returns: (full_text, list of (chapter_title, chapter_text))
+    """
+    st = os.stat(pdf_path)
+    cache_key = (os.path.abspath(pdf_path), st.st_mtime_ns, st.st_size, use_pdfplumber)
+    cached = _cache_get(_PDF_TEXT_CACHE, cache_key)
+    if cached is not None:
+        return cached
+
+    pages_text = extract_pages(pdf_path, use_pdfplumber)
+
+    # Join once rather than growing a string per page
+    full_text = "".join(text + "\n\n" for text in pages_text)
+
+    # Try to detect chapters
+    chapters = detect_chapters(full_text, pages_text)
+
+    _cache_put(_PDF_TEXT_CACHE, cache_key, (full_text, chapters), _PDF_TEXT_CACHE_SIZE)
+
+    return full_text, chapters
+
+
+def detect_chapters(full_text: str, pages_text: list[str]) -> list[tuple[str, str]]:
+    """
+    Detect chapter boundaries in the text.
+    Returns list of (chapter_title, chapter_text) tuples.
+    """
+    chapters = []
+    chapter_starts = []
+
+    # Find all chapter headings (excluding TOC entries)
+    for match in COMBINED_CHAPTER_RE.finditer(full_text):
+        title = match.group().strip()
+
+        # Skip TOC entries (lines ending with page numbers)
+        if TOC_RE.match(title):
+            continue
+
+        chapter_starts.append((match.start(), title))
+
+    # If we found chapters, split the text
+    if chapter_starts:
+        for idx, (start, title) in enumerate(chapter_starts):
+            # Get end offset (start of next chapter or end of document)
+            if idx + 1 < len(chapter_starts):
+                end = chapter_starts[idx + 1][0]
+            else:
+                end = len(full_text)
+
+            chapter_text = full_text[start:end]
+
+            # Only add if chapter has substantial content
+            if len(chapter_text.strip()) > 100:
+                chapters.append((title[:50], chapter_text))
+
+    # If no chapters found or chapters are too large, split by pages
+    if not chapters or (len(chapters) == 1 and len(chapters[0][1]) > 50000):
+        chapters = []
+        pages_per_chunk = 10
+
+        for i in range(0, len(pages_text), pages_per_chunk):
+            chunk_pages = pages_text[i:i + pages_per_chunk]
+            chunk_text = '\n\n'.join(chunk_pages)
+
+            if chunk_text.strip():
+                part_num = (i // pages_per_chunk) + 1
+                chapters.append((f"Part {part_num}", chunk_text))
+
+    # Final fallback: treat entire document as one chapter
+    if not chapters:
+        chapters = [("Full Document", full_text)]
+
+    return chapters
+
+
+def clean_text_for_speech(text: str) -> str:
+    """Clean and prepare text for TTS conversion (memoized on a content hash)."""
+    cache_key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+    cached = _cache_get(_CLEAN_TEXT_CACHE, cache_key)
+    if cached is not None:
+        return cached
+
+    # Remove page numbers
+    text = _PAGENUM.sub('\n', text)
+
+    # Remove excessive whitespace
+    text = _WS_NL.sub('\n\n', text)
+    text = _WS_SP.sub(' ', text)
+
+    # Remove common PDF artifacts
+    text = _DOTS.sub('...', text)
+
+    # Ensure sentences end with proper punctuation for better TTS pacing
+    text = _LINEBRK.sub(r'\1. \2', text)
+
+    text = text.strip()
+    _cache_put(_CLEAN_TEXT_CACHE, cache_key, text, _CLEAN_TEXT_CACHE_SIZE)
+
+    return text
@@ -18,6 +18,13 @@ def test_imports():
         print(f"  ❌ pdfplumber: {e}")
         return False
 
+    try:
+        import pypdfium2
+        print("  ✅ pypdfium2")
+    except ImportError as e:
+        print(f"  ❌ pypdfium2: {e}")
+        return False
+
     try:
         import edge_tts
         print("  ✅ edge_tts")
@@ -37,17 +44,29 @@ def test_imports():
 
 async def test_edge_tts():
     """Test that edge-tts can connect to Microsoft's service."""
+    import asyncio
     import edge_tts
 
     print("\nTesting edge-tts connection...")
 
+    async def first_audio_chunk(communicate):
+        # Stop after the first audio chunk rather than synthesizing everything
+        stream = communicate.stream()
+        try:
+            async for chunk in stream:
+                if chunk["type"] == "audio":
+                    return chunk["data"]
+        finally:
+            await stream.aclose()
+        return None
+
     try:
-        voices = await edge_tts.list_voices()
-        en_voices = [v for v in voices if v['Locale'].startswith('en-')]
-        print(f"  ✅ Connected! Found {len(en_voices)} English voices")
-        print(f"  Sample voices:")
-        for v in en_voices[:3]:
-            print(f"    - {v['ShortName']} ({v['Gender']})")
+        communicate = edge_tts.Communicate("Hi", "en-US-AriaNeural")
+        audio = await asyncio.wait_for(first_audio_chunk(communicate), timeout=15)
+        if not audio:
+            print("  ❌ Connected, but no audio was returned")
+            return False
+        print("  ✅ Connected! Received audio from en-US-AriaNeural")
         return True
     except Exception as e:
         print(f"  ❌ Connection failed: {e}")
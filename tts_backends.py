@@ -0,0 +1,100 @@
+"""
+Text-to-speech backends for the audiobook converter.
+"""
+
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from gtts import gTTS
+
+# Available languages/accents for gTTS
+VOICE_OPTIONS = {
+    "English (US)": {"lang": "en", "tld": "com"},
+    "English (UK)": {"lang": "en", "tld": "co.uk"},
+    "English (Australia)": {"lang": "en", "tld": "com.au"},
+    "English (India)": {"lang": "en", "tld": "co.in"},
+    "English (Canada)": {"lang": "en", "tld": "ca"},
+    "Spanish": {"lang": "es", "tld": "com"},
+    "French": {"lang": "fr", "tld": "com"},
+    "German": {"lang": "de", "tld": "com"},
+    "Italian": {"lang": "it", "tld": "com"},
+    "Portuguese": {"lang": "pt", "tld": "com"},
+}
+
+# Maximum number of TTS requests run concurrently (kept small to stay
+# well under Google's rate limiting)
+TTS_MAX_WORKERS = 4
+
+# Shared by all conversions so worker threads are created once and the
+# concurrency cap applies across simultaneous users
+_TTS_EXECUTOR = ThreadPoolExecutor(max_workers=TTS_MAX_WORKERS, thread_name_prefix="tts")
+
+# Long chapters are split into pieces of at most this many characters so
+# they can be synthesized in parallel and concatenated
+TTS_PIECE_MAX_CHARS = 4000
+
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+|\n{2,}')
+
+
+def split_text_for_tts(text: str, max_chars: int = TTS_PIECE_MAX_CHARS) -> list[str]:
+    """
+    Split text into pieces of at most max_chars, breaking at sentence and
+    paragraph boundaries where possible.
+    """
+    if len(text) <= max_chars:
+        return [text]
+
+    pieces = []
+    current = []
+    current_len = 0
+
+    for sentence in _SENTENCE_BREAK.split(text):
+        sentence = sentence.strip()
+
+        while sentence:
+            # Sentences longer than a whole piece are broken at a space
+            if len(sentence) > max_chars:
+                cut = sentence.rfind(' ', 0, max_chars)
+                if cut <= 0:
+                    cut = max_chars
+                unit, sentence = sentence[:cut], sentence[cut:].lstrip()
+            else:
+                unit, sentence = sentence, ""
+
+            if current and current_len + 1 + len(unit) > max_chars:
+                pieces.append(' '.join(current))
+                current = []
+                current_len = 0
+
+            current.append(unit)
+            current_len += len(unit) + (1 if current_len else 0)
+
+    if current:
+        pieces.append(' '.join(current))
+
+    return pieces
+
+
+class GTTSBackend:
+    """Google Text-to-Speech backend."""
+
+    def __init__(self, voice_name: str):
+        self.voice_name = voice_name
+        self.voice_settings = VOICE_OPTIONS.get(voice_name, VOICE_OPTIONS["English (US)"])
+
+    def synthesize(self, text: str) -> bytes:
+        """Convert a piece of text to MP3 audio."""
+        tts = gTTS(
+            text=text,
+            lang=self.voice_settings["lang"],
+            tld=self.voice_settings["tld"],
+            slow=False
+        )
+        # gTTS already streams its parts (save() writes each one as it
+        # arrives); a piece is joined here because the caller appends whole
+        # pieces to the chapter in order
+        return b"".join(tts.stream())
+
+    def submit(self, text: str) -> Future:
+        """Queue a piece of text for synthesis on the shared TTS worker pool."""
+        return _TTS_EXECUTOR.submit(self.synthesize, text)